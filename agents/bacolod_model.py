@@ -6,21 +6,62 @@ import numpy as np
 import random
 import os
 import csv 
-from stable_baselines3 import PPO
 
 import barangay_config as config
 from agents.household_agent import HouseholdAgent
 from agents.barangay_agent import BarangayAgent
 from agents.enforcement_agent import EnforcementAgent
 
+# Trained agents already loaded in this process: path -> (mtime, PPO)
+_PPO_CACHE = {}
+
+# Rule-based allocations shared by every model in this process:
+# (policy_mode, households per barangay) -> read-only action array
+_BASELINE_ACTIONS = {}
+
+def load_ppo_agent(model_path):
+    """
+    PPO.load() unzips the archive and rebuilds the torch policy every time; a
+    process that builds many models (e.g. the server's reset button) loads it once.
+    The cached agent is reused until the file on disk changes (mtime check).
+    """
+    mtime = os.path.getmtime(model_path)
+    cached = _PPO_CACHE.get(model_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    # Imported here so status-quo runs, calibration and gym workers
+    # don't pay the torch/stable-baselines3 import cost.
+    from stable_baselines3 import PPO
+    agent = PPO.load(model_path)
+    _PPO_CACHE[model_path] = (mtime, agent)
+    return agent
+
 def compute_global_compliance(model):
-    agents = [a for a in model.schedule.agents if isinstance(a, HouseholdAgent)]
-    if not agents: return 0.0
-    return sum(1 for a in agents if a.is_compliant) / len(agents)
+    # Maintained by update_compliance() from the per-barangay totals of the
+    # current tick, instead of scanning every household again for the reporter
+    return model.global_compliance
+
+def compute_barangay_compliance(model):
+    """
+    Compliant / total household counts per barangay (ordered like model.barangays)
+    in ONE pass. Households are mapped to an integer barangay code and aggregated with
+    np.bincount instead of scanning the whole schedule once per barangay.
+    """
+    households = model.households
+    codes = model.household_codes
+    n_barangays = len(model.barangays)
+
+    compliant = np.fromiter((a.is_compliant for a in households), dtype=np.float64, count=len(households))
+
+    sums = np.bincount(codes, weights=compliant, minlength=n_barangays)
+    counts = np.bincount(codes, minlength=n_barangays)
+    return sums, counts
 
 class BacolodModel(mesa.Model):
     # 1. MODIFIED INIT: Added behavior_override parameter
-    def __init__(self, seed=None, train_mode=False, policy_mode="status_quo", behavior_override=None): 
+    def __init__(self, seed=None, train_mode=False, policy_mode="status_quo", behavior_override=None,
+                 collect_data=True, verbose=True): 
         if seed is not None:
             super().__init__(seed=seed)
             self._seed = seed
@@ -29,17 +70,31 @@ class BacolodModel(mesa.Model):
         else:
             super().__init__()
 
+        # Dedicated numpy Generator for the model's bulk numpy draws (household incomes
+        # and initial compliance), seeded from the model seed (BacolodGymEnv.reset
+        # passes one) for reproducibility.
+        self.np_rng = np.random.Generator(np.random.PCG64DXSM(seed))
+
         self.train_mode = train_mode
+        # Per-tick DataCollector history (read by the visualization server's charts).
+        # Training and calibration never read it and pass collect_data=False to skip it.
+        self.collect_data = collect_data
         self.policy_mode = policy_mode 
         self.rl_agent = None
         
         # 2. STORE OVERRIDE: Save the injected genome
         self.behavior_override = behavior_override
 
-        if self.behavior_override:
-            print(f"\n[INIT] Calibration Mode Active. Overriding config.")
-        else:
-            print(f"\n[INIT] BacolodModel created with Policy Mode: {self.policy_mode.upper()}")
+        # Console logging switch, resolved once. Per-quarter messages are also muted
+        # during calibration (reduce spam), so step() only checks this one bool.
+        self.verbose = bool(verbose)
+        self._log_quarters = self.verbose and not self.behavior_override
+
+        if self.verbose:
+            if self.behavior_override:
+                print(f"\n[INIT] Calibration Mode Active. Overriding config.")
+            else:
+                print(f"\n[INIT] BacolodModel created with Policy Mode: {self.policy_mode.upper()}")
         
         # --- CSV Logging Setup (UPDATED) ---
         # Create a 'results' folder if it doesn't exist
@@ -50,29 +105,25 @@ class BacolodModel(mesa.Model):
         # Update filename to save inside the folder
         self.log_filename = os.path.join(results_dir, f"bacolod_report_{self.policy_mode}.csv")
         
-        # Only create/wipe the CSV if we are NOT calibrating (to avoid spamming files)
-        if not self.behavior_override:
-            with open(self.log_filename, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([
-                    "Quarter", "Tick", "Barangay_ID", "Barangay_Name", 
-                    "Total_Allocation_PHP", "IEC_Percent", "Enforcement_Percent", 
-                    "Incentives_Percent", "Compliance_Rate", "Active_Enforcers"
-                ])
+        # Only create/wipe the CSV if we are NOT calibrating or training (to avoid
+        # spamming files / clobbering the policy_mode report from gym workers)
+        self._write_report = not (self.behavior_override or self.train_mode)
+        self.create_report_file()
 
         # Load Brain (Only if PPO mode AND not calibrating)
         if not self.train_mode and self.policy_mode == "ppo" and not self.behavior_override:
             model_path = "models/PPO/bacolod_ppo_final.zip"
             if os.path.exists(model_path):
-                print(f"Loading Trained Agent from {model_path}...")
-                self.rl_agent = PPO.load(model_path)
+                if self.verbose:
+                    print(f"Loading Trained Agent from {model_path}...")
+                self.rl_agent = load_ppo_agent(model_path)
             else:
                 print("Warning: No trained model found. Will default to Status Quo.")
 
         # --- Financials ---
         self.annual_budget = config.ANNUAL_BUDGET
         self.current_budget = self.annual_budget
-        self.quarterly_budget = self.annual_budget / 4 
+        self.quarterly_budget = self.annual_budget / 4
         
         self.total_fines_collected = 0
         self.total_incentives_distributed = 0
@@ -80,6 +131,15 @@ class BacolodModel(mesa.Model):
         self.total_iec_cost = 0
         self.recent_fines_collected = 0
 
+        # Current quarter's allocation, one [IEC, Enf, Inc] row per barangay (PHP),
+        # plus its column totals, set by apply_action() and reused every tick
+        self.funds = np.zeros((len(config.BARANGAY_CONFIGS), 3))
+        self.total_iec_alloc = 0.0
+        self.total_enf_alloc = 0.0
+        # Last action passed to apply_action() and the tick it was applied at
+        self.held_action = None
+        self._action_tick = None
+
         # --- Grid Setup ---
         self.grid_width = 50   
         self.grid_height = 50 
@@ -94,6 +154,16 @@ class BacolodModel(mesa.Model):
 
         self.barangays = []
         self.agent_id_counter = 0 
+
+        # Households never leave the model, so they are indexed ONCE here and
+        # every per-tick consumer (compliance, patrols, redemption resets) reuses
+        # this list instead of filtering self.schedule.agents again.
+        self.households = []
+        household_codes = []
+        household_positions = []
+
+        # Active EnforcementAgents per barangay, kept in sync by adjust_enforcement_agents()
+        self.enforcers = {}
         
         # --- LOOP THROUGH CONFIGURATION ---
         for i, b_conf in enumerate(config.BARANGAY_CONFIGS):
@@ -108,37 +178,22 @@ class BacolodModel(mesa.Model):
 
             self.schedule.add(b_agent)
             self.barangays.append(b_agent)
+            self.enforcers[b_agent.unique_id] = []
             
-            # --- 3. MODIFIED BEHAVIOR EXTRACTION LOGIC ---
-            # Determine which profile this barangay uses (e.g., "Poblacion", "Liangan_East")
-            profile_key = b_conf.get("behavior_profile", "Poblacion") 
-            
-            if self.behavior_override:
-                # OPTION A: CALIBRATION MODE
-                # We use the evolved parameters passed from calibrate_config.py
-                # The override dictionary should match the structure of config.BEHAVIOR_PROFILES
-                if profile_key in self.behavior_override:
-                    behavior_data = self.behavior_override[profile_key]
-                else:
-                    # Fallback if key missing in genome
-                    behavior_data = config.BEHAVIOR_PROFILES["Poblacion"]
-            else:
-                # OPTION B: NORMAL MODE (Use static file)
-                if profile_key in config.BEHAVIOR_PROFILES:
-                    behavior_data = config.BEHAVIOR_PROFILES[profile_key]
-                else:
-                    behavior_data = config.BEHAVIOR_PROFILES["Poblacion"]
+            behavior_data = self.resolve_behavior_profile(b_conf)
 
             # Create Households
             n_households = b_conf["N_HOUSEHOLDS"]
             profile_key_income = b_conf["income_profile"]
             income_probs = list(config.INCOME_PROFILES[profile_key_income])
+
+            # Draw income levels and initial compliance for the whole barangay at once
+            incomes = self.np_rng.choice([1, 2, 3], size=n_households, p=income_probs).tolist()
+            initial_flags = (self.np_rng.random(n_households) < b_conf["initial_compliance"]).tolist()
             
-            for _ in range(n_households):
+            for income, is_compliant in zip(incomes, initial_flags):
                 x = self.random.randrange(self.grid_width)
                 y = self.random.randrange(self.grid_height)
-                income = np.random.choice([1, 2, 3], p=income_probs)
-                is_compliant = (random.random() < b_conf["initial_compliance"])
                 
                 a = HouseholdAgent(
                     self.agent_id_counter, 
@@ -150,10 +205,21 @@ class BacolodModel(mesa.Model):
                 self.agent_id_counter += 1
                 a.barangay = b_agent
                 a.barangay_id = b_agent.unique_id
+                a.household_index = len(self.households)
+                self.households.append(a)
+                household_codes.append(i)
+                household_positions.append((x, y))
                 
                 self.schedule.add(a)
                 self.grid.place_agent(a, (x, y))
 
+        # Starting flags, so reset() can put every household back without new draws
+        self._initial_compliance = [a.is_compliant for a in self.households]
+
+        self.household_codes = np.array(household_codes, dtype=np.intp)
+        # Households never move, so patrols can search this (N, 2) array directly
+        self.household_positions = np.array(household_positions, dtype=np.int64).reshape(-1, 2)
+
         # Data Collector Setup
         reporters = {
             "Global Compliance": compute_global_compliance,
@@ -161,10 +227,8 @@ class BacolodModel(mesa.Model):
         }
         
         def make_reporter(b_id):
-            return lambda m: next(
-                (b.get_local_compliance() for b in m.barangays if b.unique_id == b_id), 
-                0.0
-            )
+            b_idx = next(i for i, b in enumerate(self.barangays) if b.unique_id == b_id)
+            return lambda m: m.barangays[b_idx].compliance_rate
 
         barangay_map = {
             "Poblacion": "BGY_0",
@@ -181,8 +245,192 @@ class BacolodModel(mesa.Model):
             
         self.datacollector = DataCollector(model_reporters=reporters)
 
+        # Rule-based quarterly allocation for the non-RL policy modes
+        self.baseline_action = self.build_baseline_action()
+
+        # Initial per-barangay compliance (needed by get_state() before the first tick)
+        self.compliance_rates = np.zeros(len(self.barangays), dtype=np.float32)
+        self.global_compliance = 0.0
+        self.update_compliance()
+
+        # Everything reset() needs to rewind to this point: ids handed out so far
+        # and every RNG state after all of the construction draws (the global
+        # streams only when this model seeded them)
+        self._initial_id_counter = self.agent_id_counter
+        self._initial_random_state = self.random.getstate()
+        self._initial_np_rng_state = self.np_rng.bit_generator.state
+        if seed is not None:
+            self._initial_global_states = (random.getstate(), np.random.get_state())
+        else:
+            self._initial_global_states = None
+
+    def resolve_behavior_profile(self, b_conf):
+        # --- 3. MODIFIED BEHAVIOR EXTRACTION LOGIC ---
+        # Determine which profile this barangay uses (e.g., "Poblacion", "Liangan_East")
+        profile_key = b_conf.get("behavior_profile", "Poblacion") 
+        
+        if self.behavior_override:
+            # OPTION A: CALIBRATION MODE
+            # We use the evolved parameters passed from calibrate_config.py
+            # The override dictionary should match the structure of config.BEHAVIOR_PROFILES
+            if profile_key in self.behavior_override:
+                return self.behavior_override[profile_key]
+            # Fallback if key missing in genome
+            return config.BEHAVIOR_PROFILES["Poblacion"]
+
+        # OPTION B: NORMAL MODE (Use static file)
+        if profile_key in config.BEHAVIOR_PROFILES:
+            return config.BEHAVIOR_PROFILES[profile_key]
+        return config.BEHAVIOR_PROFILES["Poblacion"]
+
+    def create_report_file(self):
+        # Fresh quarterly report (header row only); skipped when _write_report is off
+        if not self._write_report: return
+
+        with open(self.log_filename, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow([
+                "Quarter", "Tick", "Barangay_ID", "Barangay_Name", 
+                "Total_Allocation_PHP", "IEC_Percent", "Enforcement_Percent", 
+                "Incentives_Percent", "Compliance_Rate", "Active_Enforcers"
+            ])
+
+    def reset(self, behavior_override=None):
+        """
+        Rewinds the model to the state right after __init__ (tick 0, same seed,
+        households and positions) without rebuilding the agents or the grid.
+        A behavior_override (calibration genome) replaces the households' TPB
+        profiles, so a reset model should run like a fresh
+        BacolodModel(seed, ..., behavior_override) but skips the agent setup and
+        keeps the households' cached neighbourhoods. calibrate_config checks this
+        (reset_matches_fresh) before it reuses a model.
+        """
+        if behavior_override is not None:
+            self.behavior_override = behavior_override
+            self._log_quarters = self.verbose and not self.behavior_override
+
+        # Patrols are created by apply_action(); take them off the grid. The new
+        # schedule below never sees them.
+        for patrol in self.enforcers.values():
+            for agent in patrol:
+                if agent.pos: self.grid.remove_agent(agent)
+            patrol.clear()
+        self.agent_id_counter = self._initial_id_counter
+        self.running = True
+
+        # --- Financials / Political Capital ---
+        self.current_budget = self.annual_budget
+        self.total_fines_collected = 0
+        self.total_incentives_distributed = 0
+        self.total_enforcement_cost = 0
+        self.total_iec_cost = 0
+        self.recent_fines_collected = 0
+        self.funds[:] = 0.0
+        self.total_iec_alloc = 0.0
+        self.total_enf_alloc = 0.0
+        self.held_action = None
+        self._action_tick = None
+        self.political_capital = 1.0
+
+        # --- Barangays and Households back to their starting policy / behavior ---
+        profiles = []
+        for b_agent, b_conf in zip(self.barangays, config.BARANGAY_CONFIGS):
+            b_agent.iec_fund = 0.0
+            b_agent.enf_fund = 0.0
+            b_agent.inc_fund = 0.0
+            b_agent.incentive_val = 0.0
+            b_agent.fine_amount = 500
+            b_agent.enforcement_intensity = 0.5
+            b_agent.iec_intensity = 0.0
+            # Only exists once update_policy() has run, like on a fresh model
+            if hasattr(b_agent, "current_cash_on_hand"):
+                del b_agent.current_cash_on_hand
+            profiles.append(self.resolve_behavior_profile(b_conf))
+
+        members = [[] for _ in self.barangays]
+        for a, code, is_compliant in zip(self.households, self.household_codes.tolist(), self._initial_compliance):
+            a.reset(is_compliant, behavior_params=profiles[code])
+            members[code].append(a)
+
+        # Fresh schedule (tick 0), filled in the same order as __init__ so
+        # RandomActivation shuffles the agents exactly like a new model's
+        self.schedule = RandomActivation(self)
+        for b_agent, households in zip(self.barangays, members):
+            self.schedule.add(b_agent)
+            for a in households:
+                self.schedule.add(a)
+
+        # Same random streams as a freshly constructed model
+        if self._initial_global_states is not None:
+            random.setstate(self._initial_global_states[0])
+            np.random.set_state(self._initial_global_states[1])
+        self.random.setstate(self._initial_random_state)
+        self.np_rng.bit_generator.state = self._initial_np_rng_state
+
+        self.create_report_file()
+        self.datacollector = DataCollector(model_reporters=self.datacollector.model_reporters)
+        self.update_compliance()
+
     # ... [Keep your update_political_capital, calculate_costs, etc. exactly the same] ...
     
+    def build_baseline_action(self):
+        """
+        Quarterly allocation used by the rule-based policy modes (and by PPO mode
+        when no trained agent is found). It depends only on the barangay populations
+        and the policy mode, so it is computed once per process and the same
+        read-only array is shared by every model with that setup.
+        """
+        key = (self.policy_mode, tuple(b.n_households for b in self.barangays))
+        cached = _BASELINE_ACTIONS.get(key)
+        if cached is not None:
+            return cached
+
+        action = []
+
+        # --- HYBRID ALLOCATION FIX (To Prevent Poblacion Spikes) ---
+        base_share = 0 # 10% split evenly
+        pop_share = 1  # 90% split by population
+        total_hh = sum(b.n_households for b in self.barangays)
+
+        for b in self.barangays:
+            share_base = (1.0 / len(self.barangays)) * base_share
+            share_pop = (b.n_households / total_hh) * pop_share
+            total_weight = share_base + share_pop
+
+            if self.policy_mode == "pure_incentives":
+                 action.extend([0.0, 0.0, total_weight])
+            elif self.policy_mode == "pure_enforcement":
+                 action.extend([0.0, total_weight, 0.0])
+            else: # Status Quo
+                 action.extend([total_weight, 0.0, 0.0])
+
+        action = np.array(action, dtype=np.float32)
+        action.setflags(write=False)
+        _BASELINE_ACTIONS[key] = action
+        return action
+
+    def update_compliance(self):
+        """
+        Refreshes the per-barangay compliance cache once per tick.
+        get_state() reads the float32 self.compliance_rates; DataCollector and
+        reports read each barangay's float64 compliance_rate. Neither re-scans
+        every agent per barangay.
+        """
+        sums, counts = compute_barangay_compliance(self)
+        rates = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+        # Stored as float32 (the observation dtype) so get_state() copies without a cast
+        self.compliance_rates[:] = rates
+
+        # Town-wide rate from the same per-barangay totals (no extra pass over households)
+        n_households = counts.sum()
+        self.global_compliance = float(sums.sum() / n_households) if n_households else 0.0
+
+        for b, rate, n_total, n_compliant in zip(self.barangays, rates.tolist(), counts, sums):
+            b.compliance_rate = float(rate)
+            b.total_households = int(n_total)
+            b.compliant_count = int(n_compliant)
+
     def update_political_capital(self):
         avg_enforcement = 0
         if self.barangays:
@@ -196,15 +444,17 @@ class BacolodModel(mesa.Model):
         # 1. Calculate Allocations (Daily Burn)
         # Note: We ONLY calculate burn for IEC and Enforcement.
         # Incentives are now handled dynamically by BarangayAgent.give_reward()
-        total_iec_alloc = sum(b.iec_fund for b in self.barangays)
-        total_enf_alloc = sum(b.enf_fund for b in self.barangays)
+        # (Column totals are computed once per decision in apply_action())
+        total_iec_alloc = self.total_iec_alloc
+        total_enf_alloc = self.total_enf_alloc
         
         # 2. Calculate Daily Operational Cost (Fixed costs / 90 days)
-        daily_fixed_cost = (total_iec_alloc + total_enf_alloc) / 90.0
+        days = float(config.TICKS_PER_QUARTER)
+        daily_fixed_cost = (total_iec_alloc + total_enf_alloc) / days
         
         # 3. Update Global Trackers
-        self.total_enforcement_cost += (total_enf_alloc / 90.0)
-        self.total_iec_cost += (total_iec_alloc / 90.0)
+        self.total_enforcement_cost += (total_enf_alloc / days)
+        self.total_iec_cost += (total_iec_alloc / days)
         # Note: self.total_incentives_distributed is no longer updated here.
         # It is updated inside BarangayAgent.give_reward() when money actually moves.
 
@@ -216,10 +466,7 @@ class BacolodModel(mesa.Model):
         COST_PER_ENFORCER_QUARTER = 36000.0
         target_count = int(barangay.enf_fund / COST_PER_ENFORCER_QUARTER)
         
-        current_agents = [
-            a for a in self.schedule.agents 
-            if isinstance(a, EnforcementAgent) and a.barangay_id == barangay.unique_id
-        ]
+        current_agents = self.enforcers[barangay.unique_id]
         diff = target_count - len(current_agents)
         
         if diff > 0:
@@ -229,107 +476,153 @@ class BacolodModel(mesa.Model):
                 new_agent = EnforcementAgent(e_id, self)
                 new_agent.barangay_id = barangay.unique_id
                 self.schedule.add(new_agent)
+                current_agents.append(new_agent)
                 x = self.random.randrange(self.grid_width)
                 y = self.random.randrange(self.grid_height)
                 self.grid.place_agent(new_agent, (x, y))
         elif diff < 0:
             agents_to_remove = current_agents[:abs(diff)]
+            del current_agents[:abs(diff)]
             for agent in agents_to_remove:
                 if agent.pos: self.grid.remove_agent(agent)
                 self.schedule.remove(agent)
 
     def log_quarterly_report(self, quarter):
-        # Only log if NOT in calibration mode
-        if self.behavior_override: return
+        # Only log if NOT in calibration / training mode
+        if not self._write_report: return
+
+        # Lever shares for every barangay at once from the (n, 3) allocation array
+        # (same values as the barangays' iec/enf/inc funds); 0% when nothing was allocated
+        totals = self.funds.sum(axis=1)
+        pcts = np.divide(self.funds, totals[:, None],
+                         out=np.zeros_like(self.funds), where=totals[:, None] > 0)
+        pcts *= 100
+
+        rows = []
+        for b, total, (iec_pct, enf_pct, inc_pct) in zip(self.barangays, totals.tolist(), pcts.tolist()):
+            active_enforcers = len(self.enforcers[b.unique_id])
+            
+            rows.append([
+                quarter, self.schedule.steps, b.unique_id, b.name,
+                f"{total:.2f}", f"{iec_pct:.2f}%", f"{enf_pct:.2f}%", f"{inc_pct:.2f}%",
+                f"{b.compliance_rate:.2%}", active_enforcers
+            ])
 
         # Ensure we append to the file created in __init__ (which includes the 'results/' path)
+        # All barangay rows for the quarter go out in a single writerows() call
         with open(self.log_filename, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            for b in self.barangays:
-                total = b.iec_fund + b.enf_fund + b.inc_fund
-                iec_pct = (b.iec_fund / total * 100) if total > 0 else 0
-                enf_pct = (b.enf_fund / total * 100) if total > 0 else 0
-                inc_pct = (b.inc_fund / total * 100) if total > 0 else 0
-
-                active_enforcers = len([a for a in self.schedule.agents if isinstance(a, EnforcementAgent) and a.barangay_id == b.unique_id])
-                
-                writer.writerow([
-                    quarter, self.schedule.steps, b.unique_id, b.name,
-                    f"{total:.2f}", f"{iec_pct:.2f}%", f"{enf_pct:.2f}%", f"{inc_pct:.2f}%",
-                    f"{b.get_local_compliance():.2%}", active_enforcers
-                ])
-        print(f" > Report for Quarter {quarter} saved to {self.log_filename}")
+            csv.writer(file).writerows(rows)
+        if self._log_quarters:
+            print(f" > Report for Quarter {quarter} saved to {self.log_filename}")
 
     def step(self):
         # 1. QUARTERLY DECISION POINT (Every 90 steps)
-        if self.schedule.steps % 90 == 0:
-            current_quarter = (self.schedule.steps // 90) + 1
-            if not self.behavior_override: # Reduce spam during calibration
+        if self.schedule.steps % config.TICKS_PER_QUARTER == 0:
+            current_quarter = (self.schedule.steps // config.TICKS_PER_QUARTER) + 1
+            if self._log_quarters: # Reduce spam during calibration / training
                 print(f"\n--- Quarter {current_quarter} Decision Point ({self.policy_mode.upper()}) ---")
             
-            current_state = self.get_state()
-            action = []
-
-            if self.policy_mode == "ppo" and self.rl_agent is not None:
-                action, _ = self.rl_agent.predict(current_state, deterministic=True)
-            else:
-                # --- HYBRID ALLOCATION FIX (To Prevent Poblacion Spikes) ---
-                base_share = 0 # 10% split evenly
-                pop_share = 1  # 90% split by population
-                total_hh = sum(b.n_households for b in self.barangays)
-
-                for b in self.barangays:
-                    share_base = (1.0 / len(self.barangays)) * base_share
-                    share_pop = (b.n_households / total_hh) * pop_share
-                    total_weight = share_base + share_pop
-
-                    if self.policy_mode == "pure_incentives":
-                         action.extend([0.0, 0.0, total_weight])
-                    elif self.policy_mode == "pure_enforcement":
-                         action.extend([0.0, total_weight, 0.0])
-                    else: # Status Quo
-                         action.extend([total_weight, 0.0, 0.0])
-            
-            self.apply_action(action)
+            # In train_mode the gym env applies the RL action before advancing the
+            # model, so the model must not overwrite it with its own policy_mode.
+            if not self.train_mode:
+                if self.policy_mode == "ppo" and self.rl_agent is not None:
+                    # torch is already loaded with the agent; inference_mode skips
+                    # autograd bookkeeping for this eval-only forward
+                    import torch as th
+                    current_state = self.get_state()
+                    with th.inference_mode():
+                        action, _ = self.rl_agent.predict(current_state, deterministic=True)
+                else:
+                    # Fixed rule-based allocation, built once in __init__
+                    action = self.baseline_action
+                
+                self.apply_action(action)
+            elif self.held_action is not None and self._action_tick != self.schedule.steps:
+                # The gym env decides less often than once per quarter (ticks_per_step is
+                # a multiple of a quarter): keep its last allocation, with a fresh quarterly
+                # budget and refilled incentive pots, for this quarter too
+                self.apply_action(self.held_action)
             self.log_quarterly_report(current_quarter)
 
             # --- NEW: RESET REDEMPTION FLAGS FOR THE NEW QUARTER ---
             # This allows households to claim the incentive again in the new quarter
-            if not self.behavior_override:
+            if self._log_quarters:
                 print(" >> New Quarter: Resetting Redemption Flags")
             
-            for a in self.schedule.agents:
-                if isinstance(a, HouseholdAgent):
-                    a.redeemed_this_quarter = False
+            for a in self.households:
+                a.redeemed_this_quarter = False
 
         # 2. Agents Act
-        for b in self.barangays: b.step()
         self.schedule.step()
         
         # 3. Update Globals
+        self.update_compliance()
         self.update_political_capital() 
         self.calculate_costs()
-        self.datacollector.collect(self)
+        if self.collect_data:
+            self.datacollector.collect(self)
         
-        if self.schedule.steps >= 1080: self.running = False
+        if self.schedule.steps >= config.TERM_TICKS: self.running = False
+
+    def step_n(self, n, trajectory=None):
+        """
+        Advances the simulation by up to n ticks in one call (e.g. one RL quarter),
+        stopping early once the term ends. Returns the number of ticks run.
+        If given, trajectory (array of length >= n) receives the global compliance
+        after each tick, so callers don't have to step and measure tick by tick.
+        """
+        step = self.step  # bound once, not looked up every tick
+        ticks = 0
+        while ticks < n and self.running:
+            step()
+            if trajectory is not None:
+                trajectory[ticks] = self.global_compliance
+            ticks += 1
+        return ticks
 
     def get_state(self):
-        compliance_rates = [b.get_local_compliance() for b in self.barangays]
+        """
+        Observation [CB_1..CB_n, B_Rem, M_Index, P_Cap] as a new float32 array
+        (the observation_space dtype), so callers may keep it across steps.
+        """
+        n = len(self.barangays)
         norm_budget = max(0.0, min(1.0, self.current_budget / self.annual_budget))
-        norm_time = max(0.0, min(1.0, ((self.schedule.steps // 90) + 1) / 12.0))
+        norm_time = max(0.0, min(1.0, ((self.schedule.steps // config.TICKS_PER_QUARTER) + 1) / float(config.TERM_QUARTERS)))
         p_cap = max(0.0, min(1.0, self.political_capital)) 
-        state = compliance_rates + [norm_budget, norm_time, p_cap]
-        return np.array(state, dtype=np.float32)
+
+        state = np.empty(n + 3, dtype=np.float32)
+        state[:n] = self.compliance_rates
+        state[n:] = (norm_budget, norm_time, p_cap)
+        return state
     
+    def calculate_reward(self):
+        """
+        Multi-Objective Reward (Thesis Section 3.4.4): Compliance + Sustainability - Backlash.
+        - Compliance: mean barangay compliance rate
+        - Sustainability: share of the annual budget remaining
+        - Backlash: political capital lost
+        """
+        compliance = float(self.compliance_rates.mean())
+        budget_left = max(0.0, min(1.0, self.current_budget / self.annual_budget))
+        backlash = 1.0 - max(0.0, min(1.0, self.political_capital))
+        return compliance + budget_left - backlash
+
     def apply_action(self, action_vector):
-        total_desire = sum(action_vector)
+        # View the flat action as one [IEC, Enf, Inc] row per barangay and scale it
+        # in a single numpy op instead of unpacking 3 indices per barangay in Python.
+        allocation = np.asarray(action_vector, dtype=np.float64).reshape(len(self.barangays), 3)
+        # Held so the model can re-apply it at later quarter boundaries (see step())
+        self.held_action = allocation
+        self._action_tick = self.schedule.steps
+        total_desire = allocation.sum()
         scale_factor = (self.quarterly_budget / total_desire) if total_desire > 0 else 0
+        funds = allocation * scale_factor
 
-        for i, bgy in enumerate(self.barangays):
-            idx = i * 3
-            iec_fund = action_vector[idx] * scale_factor
-            enf_fund = action_vector[idx+1] * scale_factor
-            inc_fund = action_vector[idx+2] * scale_factor
-            
+        # Keep the allocation as a contiguous (n, 3) array; its column sums
+        # replace the per-tick Python sums over barangays in calculate_costs()
+        self.funds = funds
+        self.total_iec_alloc, self.total_enf_alloc, _ = funds.sum(axis=0).tolist()
+
+        for bgy, (iec_fund, enf_fund, inc_fund) in zip(self.barangays, funds.tolist()):
             bgy.update_policy(iec_fund, enf_fund, inc_fund)
             self.adjust_enforcement_agents(bgy)
\ No newline at end of file
@@ -59,35 +59,10 @@ class BarangayAgent(mesa.Agent):
         else:
             self.incentive_val = 0
 
-    def get_local_compliance(self):
-        """
-        Calculates compliance for the DataCollector.
-        ROBUST FIX: Checks attributes instead of Class Type to avoid import errors.
-        """
-        self.total_households = 0
-        self.compliant_count = 0
-        
-        for a in self.model.schedule.agents:
-            # 1. Check if agent belongs to this Barangay
-            if getattr(a, 'barangay_id', None) == self.unique_id:
-                
-                # 2. Check if agent is a Household (has 'is_compliant' attr)
-                # This excludes Enforcers automatically.
-                if hasattr(a, 'is_compliant'):
-                    self.total_households += 1
-                    if a.is_compliant:
-                        self.compliant_count += 1
-        
-        # Avoid division by zero
-        if self.total_households == 0:
-            self.compliance_rate = 0.0
-        else:
-            self.compliance_rate = self.compliant_count / self.total_households
-            
-        return self.compliance_rate
-
     def step(self):
-        self.get_local_compliance()
+        # Compliance stats (compliance_rate, compliant_count, total_households)
+        # are refreshed in bulk by BacolodModel.update_compliance() every tick.
+        pass
 
     def give_reward(self, amount):
         """
@@ -1,5 +1,6 @@
 import mesa
 import math
+import numpy as np
 from agents.household_agent import HouseholdAgent
 
 class EnforcementAgent(mesa.Agent):
@@ -12,7 +13,8 @@ class EnforcementAgent(mesa.Agent):
         self.patrol_range = patrol_range
         self.fine_amount = 500
         # Memory to track which households have been visited
-        self.visited_households = set()
+        # (one flag per entry of model.households)
+        self.visited_mask = np.zeros(len(model.households), dtype=bool)
 
     def get_distance(self, pos_1, pos_2):
         x1, y1 = pos_1
@@ -25,28 +27,25 @@ class EnforcementAgent(mesa.Agent):
         nearby_agents = self.model.grid.get_neighbors(self.pos, moore=True, radius=1, include_center=True)
         for agent in nearby_agents:
             if isinstance(agent, HouseholdAgent):
-                self.visited_households.add(agent.unique_id)
+                self.visited_mask[agent.household_index] = True
 
         # 2. DETERMINE TARGET & MOVEMENT
-        # Get list of all HouseholdAgents in the model
-        all_households = [a for a in self.model.schedule.agents if isinstance(a, HouseholdAgent)]
-        
-        # Filter for those NOT in the visited set
-        unvisited_households = [h for h in all_households if h.unique_id not in self.visited_households]
-
         next_position = self.pos
         possible_steps = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
 
-        if unvisited_households:
-            # Find the nearest unvisited household
-            target_household = min(unvisited_households, key=lambda h: self.get_distance(self.pos, h.pos))
+        if not self.visited_mask.all():
+            # Find the nearest unvisited household in one pass over the position array
+            # (squared distance has the same argmin; visited households are masked out)
+            delta = self.model.household_positions - np.asarray(self.pos)
+            dist_sq = np.where(self.visited_mask, np.inf, (delta * delta).sum(axis=1))
+            target_pos = tuple(self.model.household_positions[np.argmin(dist_sq)].tolist())
             
             # Move towards the target
             if possible_steps:
-                next_position = min(possible_steps, key=lambda p: self.get_distance(p, target_household.pos))
+                next_position = min(possible_steps, key=lambda p: self.get_distance(p, target_pos))
         else:
             # If all households visited, clear memory to restart patrol pattern
-            self.visited_households.clear()
+            self.visited_mask[:] = False
             # Move randomly for this step while resetting
             if possible_steps:
                 next_position = self.random.choice(possible_steps)
@@ -10,9 +10,23 @@ class HouseholdAgent(mesa.Agent):
     def __init__(self, unique_id, model, income_level, initial_compliance, behavior_params=None):
         super().__init__(unique_id, model)
         self.income_level = income_level
-        self.is_compliant = initial_compliance
+        # Income sensitivity to money (gamma) is fixed per household, so compute it once
+        self.gamma = 1.5 if income_level == 1 else (1.0 if income_level == 2 else 0.8)
         self.barangay = None    
         self.barangay_id = None 
+        self.household_index = None  # Position in model.households (set by BacolodModel)
+
+        # Same-barangay households within radius 2 (filled on first use; households never move)
+        self.household_neighbors = None
+
+        self.reset(initial_compliance, behavior_params)
+
+    def reset(self, initial_compliance, behavior_params=None):
+        """
+        Sets the TPB weights and the initial internal states. Also used by
+        BacolodModel.reset() to start a new run with the same household.
+        """
+        self.is_compliant = initial_compliance
 
         # --- Use Configured Parameters or Defaults ---
         if behavior_params is None:
@@ -36,11 +50,15 @@ class HouseholdAgent(mesa.Agent):
         self.redeemed_this_quarter = False
 
     def update_social_norms(self):
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, radius=2)
-        household_neighbors = [
-            n for n in neighbors 
-            if isinstance(n, HouseholdAgent) and n.barangay_id == self.barangay_id
-        ]
+        # Households are static, so the neighbourhood query (and the filtering of
+        # enforcers / other barangays) is done once instead of every tick.
+        if self.household_neighbors is None:
+            neighbors = self.model.grid.get_neighbors(self.pos, moore=True, radius=2)
+            self.household_neighbors = [
+                n for n in neighbors 
+                if isinstance(n, HouseholdAgent) and n.barangay_id == self.barangay_id
+            ]
+        household_neighbors = self.household_neighbors
         
         if not household_neighbors:
             return 
@@ -63,7 +81,7 @@ class HouseholdAgent(mesa.Agent):
         Calculates Utility and sets Compliance.
         """
         # 1. Calculate Net Cost (C_Net)
-        gamma = 1.5 if self.income_level == 1 else (1.0 if self.income_level == 2 else 0.8)
+        gamma = self.gamma
         
         fine = self.barangay.fine_amount if self.barangay else 0
         prob_detection = self.barangay.enforcement_intensity if self.barangay else 0
@@ -2,6 +2,19 @@ import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
 from agents.bacolod_model import BacolodModel
+import barangay_config as config
+
+def check_ticks_per_step(ticks_per_step):
+    """
+    ABM ticks per RL step must be a whole number of quarters: the budget, the
+    incentive pots and the redemption flags all run on the quarterly clock, so
+    a decision covering part of a quarter would change how much money is spent.
+    """
+    ticks_per_step = int(ticks_per_step)
+    if ticks_per_step < config.TICKS_PER_QUARTER or ticks_per_step % config.TICKS_PER_QUARTER:
+        raise ValueError(f"ticks_per_step must be a positive multiple of {config.TICKS_PER_QUARTER} "
+                         f"(one quarter), got {ticks_per_step}")
+    return ticks_per_step
 
 class BacolodGymEnv(gym.Env):
     """
@@ -13,22 +26,31 @@ class BacolodGymEnv(gym.Env):
     - Observation Space: Continuous (Box), size 10 (Compliance + Budget + Time + PolCap) [Thesis Section 3.4.2]
     - Reward Function: Multi-Objective (Compliance + Sustainability - Backlash) [Thesis Section 3.4.4]
     """
-    metadata = {'render.modes': ['human']}
+    metadata = {'render_modes': ['human']}
 
-    def __init__(self):
+    def __init__(self, ticks_per_step=config.TICKS_PER_QUARTER, render_mode=None):
         super(BacolodGymEnv, self).__init__()
+        self.render_mode = render_mode
+
+        # ABM ticks (days) simulated per RL decision: one quarter by default, or k
+        # quarters, in which case the model re-applies the held allocation every quarter
+        self.ticks_per_step = check_ticks_per_step(ticks_per_step)
+
+        # Sizes follow barangay_config so the flat spaces always match the ABM
+        self.n_barangays = len(config.BARANGAY_CONFIGS)
 
         # --- 1. DEFINE ACTION SPACE (Thesis Eq 3.8) ---
-        # 21 Continuous values representing the fraction of the Quarterly Budget.
+        # 21 Continuous values (3 per barangay) representing the fraction of the Quarterly Budget.
         # Range: [0.0, 1.0]
         # Order: [Bgy0_IEC, Bgy0_Enf, Bgy0_Inc, Bgy1_IEC, ..., Bgy6_Inc]
-        self.action_space = spaces.Box(low=0.0, high=1.0, shape=(21,), dtype=np.float32)
+        self.action_space = spaces.Box(low=0.0, high=1.0, shape=(3 * self.n_barangays,), dtype=np.float32)
 
         # --- 2. DEFINE OBSERVATION SPACE (Thesis Eq 3.6) ---
-        # 10 Continuous values: 
+        # 10 Continuous values (1 per barangay + 3 globals), kept as ONE flat Box
+        # so SB3 can use the plain MlpPolicy (no Dict/MultiInputPolicy overhead):
         # [CB_1, CB_2, ..., CB_7, B_Rem, M_Index, P_Cap]
         # Range: [0.0, 1.0] (Everything is normalized)
-        self.observation_space = spaces.Box(low=0.0, high=1.0, shape=(10,), dtype=np.float32)
+        self.observation_space = spaces.Box(low=0.0, high=1.0, shape=(self.n_barangays + 3,), dtype=np.float32)
 
         # Initialize the ABM container
         self.model = None
@@ -40,8 +62,14 @@ class BacolodGymEnv(gym.Env):
         super().reset(seed=seed)
         
         # Create a fresh instance of the ABM
-        # We use a fixed seed for reproducibility during debugging, but random for training
-        self.model = BacolodModel(seed=seed if seed else 42)
+        # An explicit seed reproduces a run (debugging); otherwise draw one from the
+        # env's own np_random so every (sub-)environment simulates a different term
+        if seed is None:
+            seed = int(self.np_random.integers(0, 2**31 - 1))
+        # train_mode: the env (not the model's own policy_mode) decides the allocation.
+        # Without it the model replaced every RL action with its status-quo allocation
+        # at each quarter, so agents trained before this change must be retrained.
+        self.model = BacolodModel(seed=seed, train_mode=True, collect_data=False, verbose=False)
         
         # Get the initial state (S_0)
         observation = self.model.get_state()
@@ -54,16 +82,14 @@ class BacolodGymEnv(gym.Env):
         Thesis Section 3.2.3: "The DRL agent will make policy adjustments every quarter."
         """
         # 1. Apply the AI's action to the model (The "Hands")
+        # Normalize to a flat C-contiguous float32 vector (matches action_space) before the ABM reshapes it
+        action = np.ascontiguousarray(action, dtype=np.float32).reshape(-1)
         self.model.apply_action(action)
         
-        # 2. Run the simulation for ONE QUARTER (90 days/ticks)
+        # 2. Run the simulation for ONE QUARTER (90 days/ticks, see ticks_per_step)
         # The AI operates on a quarterly clock, while the ABM operates on a daily clock.
-        for _ in range(90):
-            self.model.step()
-            
-            # Stop early if the simulation ends (e.g., 3 years passed)
-            if not self.model.running:
-                break
+        # step_n stops early if the simulation ends (e.g., 3 years passed)
+        self.model.step_n(self.ticks_per_step)
         
         # 3. Get the new State (S_t+1) (The "Eyes")
         observation = self.model.get_state()
@@ -77,21 +103,37 @@ class BacolodGymEnv(gym.Env):
         truncated = False 
         
         # Debug Info (Optional)
+        # Plain Python scalars: SubprocVecEnv pickles this dict through a pipe every
+        # step, and numpy scalars serialize to several times the bytes of a float.
         info = {
-            "step": self.model.schedule.steps,
-            "budget": self.model.current_budget,
-            "compliance": observation[0:7].mean() # Avg compliance
+            "step": int(self.model.schedule.steps),
+            "budget": float(self.model.current_budget),
+            "compliance": float(observation[:self.n_barangays].mean()) # Avg compliance
         }
         
         return observation, reward, terminated, truncated, info
 
-    def render(self, mode='human'):
+    def set_ticks_per_step(self, n):
+        """
+        Changes how many ABM ticks one RL step advances (a multiple of a quarter),
+        e.g. to evaluate a policy at a different decision cadence than it was trained with.
+        """
+        self.ticks_per_step = check_ticks_per_step(n)
+
+    def render(self):
         """
         Optional: Print stats to console for debugging.
         """
         if self.model:
             obs = self.model.get_state()
-            print(f"--- Quarter {(self.model.schedule.steps // 90)} Report ---")
-            print(f"Avg Compliance: {obs[0:7].mean():.2f}")
-            print(f"Budget Left: {obs[7]*100:.1f}%")
-            print(f"Political Cap: {obs[9]:.2f}")
\ No newline at end of file
+            print(f"--- Quarter {(self.model.schedule.steps // config.TICKS_PER_QUARTER)} Report ---")
+            print(f"Avg Compliance: {obs[:self.n_barangays].mean():.2f}")
+            print(f"Compliance by Barangay: {np.round(obs[:self.n_barangays], 3).tolist()}")
+            print(f"Last Allocation (IEC/Enf/Inc, PHP): {np.round(self.model.funds, 0).tolist()}")
+            print(f"Budget Left: {obs[self.n_barangays]*100:.1f}%")
+            print(f"Political Cap: {obs[self.n_barangays + 2]:.2f}")
+
+
+# Registered id so VecEnv workers build the env with gym.make() (importing this
+# module locally) instead of receiving a pickled class object
+gym.register(id="BacolodGym-v0", entry_point="bacolod_gym:BacolodGymEnv")
@@ -5,6 +5,13 @@ ANNUAL_BUDGET = 1500000
 QUARTERLY_BUDGET = 375000
 MIN_WAGE = 400
 
+# --- SIMULATION CLOCK ---
+# 1 tick = 1 day. The LGU (or the RL agent) decides once per quarter,
+# and one episode covers a 3-year term (12 quarters = 1080 ticks).
+TICKS_PER_QUARTER = 90
+TERM_QUARTERS = 12
+TERM_TICKS = TICKS_PER_QUARTER * TERM_QUARTERS
+
 # --- INCOME DISTRIBUTIONS ---
 INCOME_PROFILES = {
     "low":    [0.7, 0.2, 0.1],
@@ -1,5 +1,12 @@
+import os
+import sys
+import argparse
+# One BLAS/OpenMP thread per process: genomes are scored in a process pool,
+# so letting numpy spawn threads in every worker would oversubscribe the cores
+os.environ.setdefault("OMP_NUM_THREADS", "1")
 import numpy as np
 import random
+import multiprocessing
 import copy
 import json
 from agents.bacolod_model import BacolodModel
@@ -64,19 +71,66 @@ def inject_config(genome):
     return new_profiles
 
 # --- 2. THE FITNESS FUNCTION ---
-def evaluate_genome(genome, generation_id):
-    model = BacolodModel(seed=42, policy_mode="status_quo", behavior_override=inject_config(genome))
+# Ticks simulated per genome
+N_STEPS = 100
+
+# Model reused by every evaluation in this (worker) process; see evaluate_genome
+_MODEL = None
+
+def build_model(genome):
+    return BacolodModel(seed=42, policy_mode="status_quo", behavior_override=inject_config(genome),
+                        collect_data=False)
+
+def _fresh_then_reset(genome, next_genome):
+    """
+    Global compliance trajectories (N_STEPS ticks) of a new model for genome,
+    then of the same model reset to next_genome.
+    """
+    model = build_model(genome)
+    fresh = np.zeros(N_STEPS)
+    model.step_n(N_STEPS, trajectory=fresh)
+
+    model.reset(behavior_override=inject_config(next_genome))
+    rewound = np.zeros(N_STEPS)
+    model.step_n(N_STEPS, trajectory=rewound)
+    return fresh, rewound
+
+def reset_matches_fresh(genome_a, genome_b):
+    """
+    True if BacolodModel.reset() reproduces a freshly built model: for both genomes,
+    a model reset from the other genome's run must give the same global_compliance
+    trajectory as a new one.
+    """
+    # Building a model reseeds the global random streams, which also drive the GA
+    random_state, np_state = random.getstate(), np.random.get_state()
+    try:
+        fresh_a, reset_b = _fresh_then_reset(genome_a, genome_b)
+        fresh_b, reset_a = _fresh_then_reset(genome_b, genome_a)
+    finally:
+        random.setstate(random_state)
+        np.random.set_state(np_state)
+    return np.array_equal(fresh_a, reset_a) and np.array_equal(fresh_b, reset_b)
+
+def evaluate_genome(genome, generation_id, reuse_model=False):
+    # Every genome runs the same seed-42 town. With reuse_model (only after
+    # reset_matches_fresh passed) it is built once per process and rewound with
+    # the new behavior profiles instead of re-creating ~4000 agents
+    global _MODEL
+    if not reuse_model:
+        model = build_model(genome)
+    elif _MODEL is None:
+        model = _MODEL = build_model(genome)
+    else:
+        _MODEL.reset(behavior_override=inject_config(genome))
+        model = _MODEL
     
-    compliance_history = []
-    # Run for 100 steps
-    for _ in range(100):
-        model.step()
-        agents = [a for a in model.schedule.agents if hasattr(a, 'is_compliant')]
-        if agents:
-            comp = sum(1 for a in agents if a.is_compliant) / len(agents)
-            compliance_history.append(comp)
-        else:
-            compliance_history.append(0)
+    # Run for 100 steps. Scoring only looks at the last 30 ticks, so the warm-up
+    # runs unrecorded and the model writes the tail straight into a 30-slot history
+    n_steps = N_STEPS
+    window = 30
+    compliance_history = np.zeros(window)
+    model.step_n(n_steps - window)
+    model.step_n(window, trajectory=compliance_history)
 
     # --- SCORING ---
     final_compliance = np.mean(compliance_history[-10:]) 
@@ -96,7 +150,7 @@ def evaluate_genome(genome, generation_id):
     # We calculate the Standard Deviation between barangays.
     # If they are all identical, std_dev is 0 (Penalty).
     # If they are distinct, std_dev is high (Reward).
-    final_barangay_values = [b.get_local_compliance() for b in model.barangays]
+    final_barangay_values = [b.compliance_rate for b in model.barangays]
     diversity = np.std(final_barangay_values)
     
     if diversity < 0.005: # Too identical
@@ -105,58 +159,190 @@ def evaluate_genome(genome, generation_id):
         score += diversity * 2000 # Reward uniqueness
 
     # Stability Bonus
-    volatility = np.std(compliance_history[-30:])
+    volatility = np.std(compliance_history)
     score -= volatility * 1000
 
     print(f"   > Gen {generation_id} | Compliance: {final_compliance:.2%} | Diversity: {diversity:.4f} | Score: {score:.0f}")
     return score
 
+def _evaluate_one(task):
+    """
+    Pool worker: (index, genome, generation_id, reuse_model) -> (index, score).
+    Top-level (no closures) so it can be pickled to worker processes.
+    """
+    idx, genome, generation_id, reuse_model = task
+    return idx, evaluate_genome(genome, generation_id, reuse_model)
+
+def _pool_context():
+    """
+    'fork' on Linux: workers start as copy-on-write snapshots of this process,
+    with numpy, mesa and the model modules already imported. Elsewhere the
+    platform default is kept (fork is unsafe on macOS and absent on Windows);
+    those workers re-import this module, and with it the model.
+    """
+    if sys.platform.startswith("linux"):
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def mutate_genome(survivors):
+    parent = random.choice(survivors)
+    child = parent.copy()
+    
+    # Mutate
+    key = random.choice(list(child.keys()))
+    child[key] *= random.uniform(0.90, 1.10) # +/- 10%
+    
+    # Simple clamping
+    if "cost" in key:
+        if "Poblacion" in key: child[key] = max(0.35, min(0.55, child[key]))
+        else: child[key] = max(0.15, min(0.40, child[key]))
+    
+    return child
+
+# --- SURROGATE PRE-SCREENING (optional) ---
+# Candidate children drawn per child slot when the surrogate picks who gets simulated
+SURROGATE_CANDIDATES = 4
+
+def _genome_vector(genome):
+    # Children are parent.copy(), so every genome keeps the same key order
+    return np.fromiter(genome.values(), dtype=np.float64, count=len(genome))
+
+def screen_children(candidates, n_keep, archive_X, archive_y):
+    """
+    Fits a Gaussian process (Matern 5/2) to every (genome, score) simulated so far
+    and keeps the n_keep candidates with the highest upper confidence bound
+    (mean + std): each slot in the next generation's ABM runs goes to a child
+    that looks promising or that the surrogate knows little about.
+    """
+    # Imported here so plain calibration runs don't need scikit-learn
+    from sklearn.gaussian_process import GaussianProcessRegressor
+    from sklearn.gaussian_process.kernels import Matern
+
+    X = np.asarray(archive_X)
+    # Survivors are re-scored every generation, so the archive repeats genomes;
+    # a small alpha (diagonal jitter) keeps the kernel matrix invertible
+    gp = GaussianProcessRegressor(kernel=Matern(length_scale=np.ones(X.shape[1]), nu=2.5),
+                                  alpha=1e-6, normalize_y=True)
+    gp.fit(X, np.asarray(archive_y))
+
+    mean, std = gp.predict(np.array([_genome_vector(c) for c in candidates]), return_std=True)
+    keep = np.argsort(-(mean + std))[:n_keep]
+    return [candidates[i] for i in keep]
+
+# --- CHECKPOINTS ---
+def save_checkpoint(path, state):
+    """
+    Writes the GA state as JSON to a temporary file and renames it over `path`,
+    so an interruption mid-write never leaves a truncated checkpoint behind.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    with open(path) as f:
+        return json.load(f)
+
 # --- 3. THE EVOLUTION LOOP ---
-def run_calibration(generations=8, population_size=15):
+def run_calibration(generations=8, population_size=15, processes=None, surrogate=False, checkpoint_path=None):
     print(f"Starting UNIQUE Calibration: {generations} gens, {population_size} pop size")
+    processes = processes or os.cpu_count() or 1
     
     population = [generate_random_genome() for _ in range(population_size)]
     best_genome = None
     best_score = -float('inf')
-    
-    for gen in range(generations):
-        print(f"\n--- Generation {gen+1} ---")
-        scored_pop = []
-        
-        for genome in population:
-            score = evaluate_genome(genome, gen+1)
-            scored_pop.append((score, genome))
-            
-            if score > best_score:
-                best_score = score
-                best_genome = genome
-        
-        scored_pop.sort(key=lambda x: x[0], reverse=True)
-        top_score = scored_pop[0][0]
-        print(f"   >>> BEST IN GEN {gen+1}: {top_score:.0f}")
-        
-        if gen == generations - 1:
-            break
+    # Every simulated (genome, score) pair, used to fit the surrogate
+    archive_X, archive_y = [], []
+    start_gen = 0
 
-        survivors = [g for s, g in scored_pop[:population_size//2]]
-        new_population = survivors[:]
-        
-        while len(new_population) < population_size:
-            parent = random.choice(survivors)
-            child = parent.copy()
+    # Resume an interrupted run: the checkpoint holds the next generation to score,
+    # the best genome so far, the surrogate archive and the mutation RNG state
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        state = load_checkpoint(checkpoint_path)
+        # A checkpoint only continues the run that wrote it: mixing population sizes
+        # or surrogate/no-surrogate generations would silently change the search
+        for key, value in (("population_size", population_size), ("surrogate", surrogate)):
+            if state.get(key) != value:
+                raise ValueError(f"{checkpoint_path} was written with {key}={state.get(key)!r}, "
+                                 f"this run uses {key}={value!r}; rerun with the same settings "
+                                 f"or delete the checkpoint to start over")
+        if state.get("generations") != generations:
+            print(f"Warning: {checkpoint_path} was written for {state.get('generations')} generations, "
+                  f"continuing up to {generations}")
+        start_gen = state["generation"]
+        population = state["population"]
+        best_genome, best_score = state["best_genome"], state["best_score"]
+        archive_X = [np.array(x) for x in state["archive_X"]]
+        archive_y = state["archive_y"]
+        version, internal_state, gauss_next = state["random_state"]
+        random.setstate((version, tuple(internal_state), gauss_next))
+        print(f"Resuming from {checkpoint_path} at generation {start_gen+1}")
+
+    # Only reuse one model per worker if rewinding it is indistinguishable from a new one
+    reuse_model = reset_matches_fresh(population[0], population[-1])
+    if not reuse_model:
+        print("Warning: a reset model diverges from a fresh one; building a new model per genome")
+
+    # One pool for the whole run: workers are started once and reused by every generation
+    with _pool_context().Pool(processes=processes) as pool:
+        for gen in range(start_gen, generations):
+            print(f"\n--- Generation {gen+1} ---")
+            # Every genome is an independent ABM run (fixed seed), so score them in parallel.
+            # imap_unordered streams results back as soon as each run finishes.
+            scores = [None] * len(population)
+            tasks = [(i, genome, gen+1, reuse_model) for i, genome in enumerate(population)]
+            chunksize = max(1, len(tasks) // (4 * processes))
+            for idx, score in pool.imap_unordered(_evaluate_one, tasks, chunksize=chunksize):
+                scores[idx] = score
+
+            scored_pop = list(zip(scores, population))
+            if surrogate:
+                archive_X.extend(_genome_vector(g) for g in population)
+                archive_y.extend(scores)
             
-            # Mutate
-            key = random.choice(list(child.keys()))
-            child[key] *= random.uniform(0.90, 1.10) # +/- 10%
+            for score, genome in scored_pop:
+                if score > best_score:
+                    best_score = score
+                    best_genome = genome
             
-            # Simple clamping
-            if "cost" in key:
-                if "Poblacion" in key: child[key] = max(0.35, min(0.55, child[key]))
-                else: child[key] = max(0.15, min(0.40, child[key]))
+            scored_pop.sort(key=lambda x: x[0], reverse=True)
+            top_score = scored_pop[0][0]
+            print(f"   >>> BEST IN GEN {gen+1}: {top_score:.0f}")
             
-            new_population.append(child)
+            if gen == generations - 1:
+                break
+
+            survivors = [g for s, g in scored_pop[:population_size//2]]
+            n_children = population_size - len(survivors)
             
-        population = new_population
+            if surrogate:
+                # Breed several times more children than there are slots and only
+                # simulate the ones the surrogate ranks highest
+                candidates = [mutate_genome(survivors) for _ in range(n_children * SURROGATE_CANDIDATES)]
+                children = screen_children(candidates, n_children, archive_X, archive_y)
+            else:
+                children = [mutate_genome(survivors) for _ in range(n_children)]
+                
+            population = survivors + children
+
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, {
+                    "generations": generations,
+                    "population_size": population_size,
+                    "surrogate": surrogate,
+                    "generation": gen + 1,
+                    "population": population,
+                    "best_genome": best_genome,
+                    "best_score": best_score,
+                    "archive_X": [x.tolist() for x in archive_X],
+                    "archive_y": archive_y,
+                    "random_state": random.getstate(),
+                })
+
+    # Finished runs start over next time instead of resuming
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
 
     print("\n--- CALIBRATION COMPLETE ---")
     print("Paste this generated config into your barangay_config.py manually.")
@@ -167,5 +353,24 @@ def run_calibration(generations=8, population_size=15):
     
     return best_genome
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Calibrate the per-barangay behavior profiles with a genetic algorithm.")
+    parser.add_argument("--generations", type=int, default=8, help="GA generations (default: %(default)s).")
+    parser.add_argument("--population", type=int, default=15, help="Genomes per generation (default: %(default)s).")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all CPUs).")
+    parser.add_argument(
+        "--surrogate", action="store_true",
+        help=f"Pre-screen {SURROGATE_CANDIDATES}x as many children with a Gaussian-process surrogate "
+             f"(scikit-learn) fitted to all scored genomes, and only simulate the most promising."
+    )
+    parser.add_argument(
+        "--checkpoint", default=None, metavar="PATH",
+        help="Save the GA state to PATH (JSON) after every generation and resume from it if it "
+             "exists, so an interrupted calibration does not start over. Removed when the run completes."
+    )
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    run_calibration()
\ No newline at end of file
+    args = parse_args()
+    run_calibration(args.generations, args.population, args.processes,
+                    surrogate=args.surrogate, checkpoint_path=args.checkpoint)
\ No newline at end of file
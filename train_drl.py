@@ -1,13 +1,193 @@
 import os
+import math
+import argparse
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+import torch as th
 import gymnasium as gym
 from stable_baselines3 import PPO
 from stable_baselines3.common.env_checker import check_env
 from stable_baselines3.common.callbacks import CheckpointCallback
+from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
 
 # Import your custom environment
-from bacolod_gym import BacolodGymEnv
+from bacolod_gym import BacolodGymEnv, check_ticks_per_step
+import barangay_config as config
+
+# "module:id" makes gym.make() import bacolod_gym (and its registration) in each worker.
+# make_vec_env() defaults string ids to render_mode="rgb_array", which BacolodGymEnv
+# does not support, so every make_vec_env() call passes render_mode=None explicitly.
+ENV_ID = "bacolod_gym:BacolodGym-v0"
+
+def evaluate_policy(model, output_path, n_episodes=1, ticks_per_step=config.TICKS_PER_QUARTER, seed=None):
+    """
+    Rolls out the trained policy and writes one CSV row per RL step (a quarter by
+    default; ticks_per_step, a multiple of a quarter, may differ from the value
+    used in training). "quarter" is the term quarter reached at the end of the step.
+    Episodes run concurrently in a VecEnv so a single batched model.predict()
+    serves every running episode. With a seed, sub-environment i starts from
+    seed + i, so a multi-episode evaluation is reproducible. Metrics are written
+    into a preallocated structured array and each episode is appended to
+    output_path as soon as it finishes, so memory stays bounded by one episode
+    per sub-environment.
+    """
+    if n_episodes < 1:
+        raise ValueError(f"n_episodes must be >= 1, got {n_episodes}")
+    ticks_per_step = check_ticks_per_step(ticks_per_step)
+
+    n_barangays = len(config.BARANGAY_CONFIGS)
+    max_steps = math.ceil(config.TERM_TICKS / ticks_per_step)
+
+    # One record per RL step: scalars, then per-barangay compliance and levers as
+    # fixed-size sub-arrays (assigned in one go, no per-column keys)
+    row_dtype = np.dtype([
+        ("episode", np.int64), ("quarter", np.int64), ("reward", np.float64),
+        ("total_reward_so_far", np.float64), ("budget", np.float64), ("compliance", np.float64),
+        ("compliance_b", np.float64, (n_barangays,)), ("action", np.float64, (n_barangays * 3,)),
+    ])
+    compliance_cols = [f"compliance_b{b}" for b in range(n_barangays)]
+    action_cols = [f"{lever}_b{b}" for b in range(n_barangays) for lever in ("iec", "enf", "inc")]
+    columns = list(row_dtype.names[:6]) + compliance_cols + action_cols
+
+    # Each ABM quarter is expensive, so episodes run in separate processes.
+    # All episodes have the same length, so the envs run in lockstep "waves".
+    # Size the VecEnv to split the episodes into equal waves: otherwise envs that
+    # already finished their share would keep simulating throw-away episodes
+    # while the last wave completes (e.g. 10 episodes on 8 CPUs -> 2 waves of 5).
+    max_envs = min(n_episodes, os.cpu_count() or 1)
+    n_waves = math.ceil(n_episodes / max_envs)
+    n_envs = math.ceil(n_episodes / n_waves)
+    vec_env_cls = SubprocVecEnv if n_envs > 1 else DummyVecEnv
+    vec_env = make_vec_env(ENV_ID, n_envs=n_envs, seed=seed, vec_env_cls=vec_env_cls,
+                           env_kwargs={"ticks_per_step": ticks_per_step, "render_mode": None})
+
+    # One row buffer per sub-environment, flushed when its episode ends
+    rows = np.zeros((n_envs, max_steps), dtype=row_dtype)
+    t = np.zeros(n_envs, dtype=int)
+
+    episode_ids = np.arange(n_envs)
+    next_episode = n_envs
+    active = np.ones(n_envs, dtype=bool)
+
+    # Numeric-only rows: np.savetxt with a fixed format per column skips pandas'
+    # per-cell dtype/quoting logic. The file stays open for the whole run and is
+    # flushed by its buffer, not per row or per episode.
+    header = ",".join(columns)
+    fmt = ["%d", "%d"] + ["%.6f"] * (len(columns) - 2)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    obs = vec_env.reset()
+
+    with open(output_path, "w", newline="") as out:
+        out.write(header + "\n")
+
+        while active.any():
+            # Ask the AI for actions for every running episode in one batch
+            # (inference_mode: no autograd/version-counter bookkeeping for eval-only forwards)
+            with th.inference_mode():
+                action, _states = model.predict(obs, deterministic=True)
+
+            # Apply the actions
+            obs, rewards, dones, infos = vec_env.step(action)
+
+            for i in np.flatnonzero(active):
+                info = infos[i]
+                # The VecEnv auto-resets finished envs; their final state is kept in info
+                final_obs = info["terminal_observation"] if dones[i] else obs[i]
+
+                step = t[i]
+                # Field views of the buffer, indexed by (env, step): written in place
+                rows["episode"][i, step] = episode_ids[i]
+                rows["quarter"][i, step] = info['step'] // config.TICKS_PER_QUARTER
+                rows["reward"][i, step] = rewards[i]
+                rows["budget"][i, step] = info['budget']
+                rows["compliance"][i, step] = info['compliance']
+                rows["compliance_b"][i, step] = final_obs[:n_barangays]
+                rows["action"][i, step] = action[i]
+                t[i] += 1
+
+                # Print the result of this RL step
+                print(f"Episode: {episode_ids[i]} | Step: {info['step']} | Budget Left: {info['budget']:.0f} | Compliance: {info['compliance']:.2%}")
+
+                if dones[i]:
+                    episode = rows[i, :t[i]]
+                    # Running episode return in one cumsum instead of per-step bookkeeping
+                    np.cumsum(episode["reward"], out=episode["total_reward_so_far"])
+                    # Flatten the records (sub-arrays included) into plain CSV columns
+                    np.savetxt(out, structured_to_unstructured(episode, dtype=np.float64),
+                               fmt=fmt, delimiter=",")
+                    t[i] = 0
+
+                    if next_episode < n_episodes:
+                        episode_ids[i] = next_episode
+                        next_episode += 1
+                    else:
+                        active[i] = False
+
+    vec_env.close()
+    return output_path
+
+# Vectorized env backends for training rollouts
+VEC_ENV_CLASSES = {"dummy": DummyVecEnv, "subproc": SubprocVecEnv}
+
+def _positive_int(value):
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be >= 1, got {value}")
+    return value
+
+def _ticks_per_step_arg(value):
+    try:
+        return check_ticks_per_step(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the PPO budget-allocation agent on the Bacolod ABM.")
+    parser.add_argument(
+        "--n-envs", type=_positive_int, default=1,
+        help="Number of parallel ABM environments used to collect rollouts (default: 1)."
+    )
+    parser.add_argument(
+        "--vec-cls", choices=sorted(VEC_ENV_CLASSES), default=None,
+        help="VecEnv backend. 'dummy' steps every env in this process (no IPC); "
+             "'subproc' runs one worker process per env. Subproc only pays off when a "
+             "single env step costs more than ~1 ms of Python work, which one ABM "
+             "quarter (90 ticks x ~4000 agents) always does. "
+             "Default: subproc when --n-envs > 1, otherwise dummy."
+    )
+    parser.add_argument(
+        "--device", default="auto",
+        help="Torch device for the policy network ('cpu', 'cuda', 'cuda:0', or 'auto' to use "
+             "CUDA when available). Rollouts always run on CPU; observations are already "
+             "contiguous float32, so SB3 moves each batch to the device without a conversion."
+    )
+    parser.add_argument(
+        "--ticks-per-step", type=_ticks_per_step_arg, default=config.TICKS_PER_QUARTER,
+        help="ABM ticks (days) simulated per RL decision; must be a multiple of "
+             f"{config.TICKS_PER_QUARTER} (one quarter, the default). With k quarters per "
+             "decision the allocation is held for k quarters: at every quarter boundary the "
+             "model re-applies it with a fresh quarterly budget and refilled incentive pots, "
+             "so spending per quarter is unchanged. Larger values mean fewer VecEnv round-trips "
+             "and policy calls, but fewer, coarser decisions and a blurrier link between each "
+             "action and its reward."
+    )
+    parser.add_argument(
+        "--eval-episodes", type=_positive_int, default=1,
+        help="Episodes (3-year terms) rolled out when testing the trained policy. They run "
+             "side by side in one VecEnv so each policy forward serves all of them (default: 1)."
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None,
+        help="Base seed for the evaluation episodes (episode env i uses seed + i). Default: random."
+    )
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    vec_cls = args.vec_cls or ("subproc" if args.n_envs > 1 else "dummy")
+
     # 1. Create Directories for Logs and Models
     models_dir = "models/PPO"
     log_dir = "logs"
@@ -15,13 +195,19 @@ def main():
     os.makedirs(log_dir, exist_ok=True)
 
     # 2. Instantiate the Environment
-    env = BacolodGymEnv()
+    env = BacolodGymEnv(ticks_per_step=args.ticks_per_step)
     
     # Sanity Check: Ensures your Gym environment adheres to standards
     # If this fails, there is a bug in bacolod_gym.py
     print("Checking environment...")
     check_env(env)
     print("Environment is valid!")
+    env.close()
+
+    # Rollout environments (one BacolodModel per env)
+    train_env = make_vec_env(ENV_ID, n_envs=args.n_envs, vec_env_cls=VEC_ENV_CLASSES[vec_cls],
+                             env_kwargs={"ticks_per_step": args.ticks_per_step, "render_mode": None})
+    print(f"Collecting rollouts from {args.n_envs} env(s) with {VEC_ENV_CLASSES[vec_cls].__name__}")
 
     # 3. Define the PPO Model (The "Brain")
     # Hyperparameters aligned with Thesis Section 3.4.1 [cite: 608]
@@ -30,9 +216,10 @@ def main():
     # - Network Architecture: Actor-Critic with 2 hidden layers of 64 neurons [cite: 608]
     model = PPO(
         "MlpPolicy",
-        env,
+        train_env,
         verbose=1,
         tensorboard_log=log_dir,
+        device=args.device,
         learning_rate=0.0003,
         gamma=0.99,  # Thesis Eq 3.5.3 (Discount Factor)
         policy_kwargs=dict(
@@ -53,22 +240,13 @@ def main():
     model_path = f"{models_dir}/bacolod_ppo_final"
     model.save(model_path)
     print(f"Training complete. Model saved to {model_path}.zip")
+    train_env.close()
 
     # --- OPTIONAL: Test the Trained Model ---
     print("\nTesting the trained policy...")
-    obs, _ = env.reset()
-    done = False
-    
-    while not done:
-        # Ask the AI for an action based on the current state
-        action, _states = model.predict(obs)
-        
-        # Apply the action
-        obs, reward, terminated, truncated, info = env.step(action)
-        done = terminated or truncated
-        
-        # Print the result of this quarter
-        print(f"Step: {info['step']} | Budget Left: {info['budget']:.0f} | Compliance: {info['compliance']:.2%}")
+    results_path = evaluate_policy(model, "results/bacolod_eval_ppo.csv", n_episodes=args.eval_episodes,
+                                   ticks_per_step=args.ticks_per_step, seed=args.seed)
+    print(f"Evaluation saved to {results_path}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file